@@ -6,6 +6,7 @@ Handles spectral analysis including Alpha power and frequency spectrum
 import numpy as np
 from scipy import signal
 from scipy.signal import spectrogram, welch
+from scipy.integrate import trapezoid
 import mne
 from typing import Tuple, Optional
 
@@ -44,9 +45,6 @@ class EEGAnalyzer:
             if data is None:
                 return None, None
                 
-            # Convert to microvolts
-            data = data * 1e6
-                
             # Get sampling rate
             sfreq = self.processor.get_sampling_rate()
             
@@ -55,28 +53,28 @@ class EEGAnalyzer:
             overlap_samples = int(overlap * sfreq)
             step_samples = window_samples - overlap_samples
             
-            # Get signal for the specified channel
-            signal_data = data[channel_idx]
-            
-            # Calculate sliding window alpha power
-            alpha_powers = []
-            window_times = []
-            
-            for start_idx in range(0, len(signal_data) - window_samples + 1, step_samples):
-                end_idx = start_idx + window_samples
-                window_data = signal_data[start_idx:end_idx]
+            # Get signal for the specified channel, in microvolts
+            signal_data = data[channel_idx] * 1e6
+            if len(signal_data) < window_samples:
+                return np.array([]), np.array([])
                 
-                # Calculate power spectral density for this window
-                freqs, psd = welch(window_data, fs=sfreq, nperseg=window_samples)
+            # All windows as strided views of the signal (no copy)
+            windows = np.lib.stride_tricks.sliding_window_view(signal_data, window_samples)[::step_samples]
+            starts = np.arange(0, len(signal_data) - window_samples + 1, step_samples)
+            
+            # Welch PSD of many windows per call instead of one call per window;
+            # blocks bound the temporary copies scipy makes
+            alpha_powers = np.empty(len(windows))
+            block = 512
+            for i in range(0, len(windows), block):
+                freqs, psd = welch(windows[i:i + block], fs=sfreq, nperseg=window_samples, axis=-1)
                 
                 # Find alpha band (8-13 Hz) indices
                 alpha_mask = (freqs >= 8) & (freqs <= 13)
-                alpha_power = np.mean(psd[alpha_mask])
-                
-                alpha_powers.append(alpha_power)
-                window_times.append(times[start_idx + window_samples // 2])  # Middle of window
+                alpha_powers[i:i + block] = np.mean(psd[:, alpha_mask], axis=-1)
                 
-            return np.array(window_times), np.array(alpha_powers)
+            window_times = times[starts + window_samples // 2]  # Middle of window
+            return window_times, alpha_powers
             
         except Exception as e:
             print(f"❌ Error calculating alpha power: {e}")
@@ -290,26 +288,28 @@ class EEGAnalyzer:
             window_samples = int(2.0 * sfreq)  # 2 second windows
             overlap_samples = int(0.5 * window_samples)  # 50% overlap
             
-            power_values = []
-            
-            for i in range(0, len(channel_data) - window_samples + 1, window_samples - overlap_samples):
-                window_data = channel_data[i:i + window_samples]
+            step_samples = window_samples - overlap_samples
+            if len(channel_data) < window_samples:
+                return np.array([])
                 
-                # Calculate power spectral density
-                from scipy import signal
-                freqs, psd = signal.welch(window_data, sfreq, nperseg=min(window_samples, 256))
+            # All windows as strided views of the channel (no copy)
+            windows = np.lib.stride_tricks.sliding_window_view(channel_data, window_samples)[::step_samples]
+            
+            # Welch PSD of many windows per call instead of one call per window;
+            # blocks bound the temporary copies scipy makes
+            power_values = np.zeros(len(windows))
+            block = 512
+            for i in range(0, len(windows), block):
+                freqs, psd = welch(windows[i:i + block], sfreq, nperseg=min(window_samples, 256), axis=-1)
                 
                 # Find frequency indices for the band
                 freq_mask = (freqs >= low_freq) & (freqs <= high_freq)
                 
-                # Calculate power in the band
+                # Calculate power in the band (zero if no bin falls inside it)
                 if np.any(freq_mask):
-                    band_power = np.trapz(psd[freq_mask], freqs[freq_mask])
-                    power_values.append(band_power)
-                else:
-                    power_values.append(0)
+                    power_values[i:i + block] = trapezoid(psd[:, freq_mask], freqs[freq_mask], axis=-1)
                     
-            return np.array(power_values)
+            return power_values
             
         except Exception as e:
             print(f"Error calculating {band_name} band power: {e}")
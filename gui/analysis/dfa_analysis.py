@@ -3,15 +3,186 @@ DFA Analysis
 Detrended Fluctuation Analysis for EEG signals
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                             QPushButton, QSpinBox, QDoubleSpinBox, QGroupBox,
-                             QTextEdit, QProgressBar, QCheckBox)
-from PyQt5.QtCore import pyqtSignal, QTimer, Qt
+                             QPushButton, QSpinBox, QGroupBox, QTextEdit)
+from PyQt5.QtCore import pyqtSignal, QTimer
 import pyqtgraph as pg
-from scipy import signal
-from sklearn.linear_model import LinearRegression
 from utils.ui_helpers import setup_dark_plot
+from utils._njit import HAVE_NUMBA, njit, prange
+from utils.workers import FunctionWorker
+from utils.cache import BoundedCache
+
+
+def _segment_indices(n_segments, max_segments):
+    """Evenly spaced segment indices, at most max_segments of them (at least one)"""
+    if n_segments <= max_segments:
+        return np.arange(n_segments)
+    if max_segments < 2:
+        return np.zeros(1, dtype=int)  # no spacing to speak of; the first segment
+    return (np.arange(max_segments) * (n_segments - 1)) // (max_segments - 1)
+
+
+def _scale_fluctuation(profile, scale, max_segments):
+    """Detrended RMS fluctuation F(scale) of the profile (NaN if < 2 segments)
+    
+    Segments are taken from the start and, again, from the end of the profile
+    (Kantelhardt et al., 2001) so the tail that does not fill a whole segment
+    still contributes. At most max_segments are used from each direction.
+    """
+    # Divide signal into non-overlapping segments
+    n_segments = len(profile) // scale
+    if n_segments < 2:
+        return np.nan
+        
+    # Forward and reverse segments stacked into one array, then centred in place;
+    # this is the only (2 * n_segments x scale) array allocated
+    used = n_segments * scale
+    idx = _segment_indices(n_segments, max_segments)
+    forward = profile[:used].reshape(n_segments, scale)
+    reverse = profile[len(profile) - used:].reshape(n_segments, scale)
+    y_centered = np.concatenate((forward[idx], reverse[idx]))
+    y_centered -= np.mean(y_centered, axis=1, keepdims=True)
+    
+    # Regression constants for x = 0..scale-1: sum((x - x_mean)^2) = n(n^2 - 1)/12
+    x_centered = np.arange(scale) - (scale - 1) / 2.0
+    x_centered_squared = scale * (scale * scale - 1) / 12.0
+    
+    # Fit all segments at once; detrending and RMS reduce to sums over the
+    # centred segments, so no trend or detrended array is materialized
+    slope = np.einsum('ij,j->i', y_centered, x_centered) / x_centered_squared
+    rss = np.einsum('ij,ij->i', y_centered, y_centered) - slope ** 2 * x_centered_squared
+    
+    # Root of the mean squared fluctuation over all segments
+    return np.sqrt(np.mean(np.maximum(rss, 0)) / scale)
+
+
+def _segment_table(n_samples, scales, max_segments):
+    """Flatten the forward and reverse segments of every scale into (scale index, start sample) arrays"""
+    task_scale = []
+    task_start = []
+    for k, scale in enumerate(scales):
+        n_segments = n_samples // scale
+        if n_segments < 2:
+            continue
+        starts = _segment_indices(n_segments, max_segments).astype(np.int64) * scale
+        task_scale.append(np.full(2 * len(starts), k, dtype=np.int64))
+        task_start.append(np.concatenate((starts, starts + (n_samples - n_segments * scale))))
+    if not task_scale:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(task_scale), np.concatenate(task_start)
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def _dfa_core(centered, scales, task_scale, task_start):
+    """Detrended mean square of every segment in the table, all scales in one parallel loop
+    
+    Reads the float32 mean-removed signal and integrates each segment locally in
+    float64; the local profile differs from the global one only by a constant,
+    which the linear detrend removes.
+    """
+    f2 = np.empty(task_start.shape[0])
+    for t in prange(task_start.shape[0]):
+        scale = scales[task_scale[t]]
+        start = task_start[t]
+        
+        # Regression constants for x = 0..scale-1 (see _scale_fluctuation)
+        x_mean = (scale - 1) / 2.0
+        denom = scale * (scale * scale - 1) / 12.0
+        
+        y = 0.0
+        sy = 0.0
+        syy = 0.0
+        sxy = 0.0
+        for i in range(scale):
+            y += np.float64(centered[start + i])
+            sy += y
+            syy += y * y
+            sxy += i * y
+        slope = (sxy - x_mean * sy) / denom
+        rss = syy - sy * sy / scale - slope * slope * denom
+        f2[t] = max(rss, 0.0) / scale
+    return f2
+
+
+def _fluctuations(centered, scales, max_segments):
+    """Detrended RMS fluctuation of the integrated signal for each scale (NaN where there are < 2 segments)"""
+    if not HAVE_NUMBA:
+        # Integrate once; float64 so the running sum does not drift on long recordings
+        profile = np.cumsum(centered, dtype=np.float64)
+        
+        # Scales are independent and NumPy releases the GIL in the reductions
+        with ThreadPoolExecutor() as executor:
+            return np.array(list(executor.map(
+                lambda scale: _scale_fluctuation(profile, scale, max_segments), scales)))
+        
+    task_scale, task_start = _segment_table(len(centered), scales, max_segments)
+    f2 = _dfa_core(centered, scales, task_scale, task_start)
+    
+    # Root of the mean squared fluctuation of each scale
+    counts = np.bincount(task_scale, minlength=len(scales))
+    sums = np.bincount(task_scale, weights=f2, minlength=len(scales))
+    fluctuations = np.full(len(scales), np.nan)
+    np.divide(sums, counts, out=fluctuations, where=counts > 0)
+    return np.sqrt(fluctuations)
+
+
+def calculate_dfa_batch(profiles, scales, max_segments=500):
+    """DFA scaling exponent of several equal-length channels at once
+    
+    ``profiles`` is an (n_channels, N) array of integrated, mean-removed signals.
+    Each scale is reshaped to (n_channels, n_segments, scale) and regressed for
+    all channels in one einsum. Returns (n_channels,) alphas, NaN for a channel
+    with a zero fluctuation.
+    """
+    profiles = np.atleast_2d(np.asarray(profiles, dtype=np.float64))
+    n_channels, n_samples = profiles.shape
+    scales = np.unique(np.asarray(scales, dtype=int))
+    scales = scales[(scales >= 2) & (scales * 2 <= n_samples)]
+    if len(scales) < 2:
+        return np.full(n_channels, np.nan)
+        
+    log_fluctuations = np.empty((n_channels, len(scales)))
+    for k, scale in enumerate(scales):
+        # Forward and reverse segments, as in _scale_fluctuation
+        n_segments = n_samples // scale
+        used = n_segments * scale
+        idx = _segment_indices(n_segments, max_segments)
+        forward = profiles[:, :used].reshape(n_channels, n_segments, scale)
+        reverse = profiles[:, n_samples - used:].reshape(n_channels, n_segments, scale)
+        y_centered = np.concatenate((forward[:, idx], reverse[:, idx]), axis=1)
+        y_centered -= np.mean(y_centered, axis=2, keepdims=True)
+        
+        x_centered = np.arange(scale) - (scale - 1) / 2.0
+        x_centered_squared = scale * (scale * scale - 1) / 12.0
+        slope = np.einsum('cij,j->ci', y_centered, x_centered) / x_centered_squared
+        rss = np.einsum('cij,cij->ci', y_centered, y_centered) - slope ** 2 * x_centered_squared
+        
+        fluctuation = np.sqrt(np.mean(np.maximum(rss, 0), axis=1) / scale)
+        with np.errstate(divide='ignore'):
+            log_fluctuations[:, k] = np.log10(fluctuation)
+            
+    # Least-squares slope in log-log space for every channel
+    log_scales = np.log10(scales) - np.mean(np.log10(scales))
+    with np.errstate(invalid='ignore'):
+        log_fluctuations -= np.mean(log_fluctuations, axis=1, keepdims=True)
+        return log_fluctuations @ log_scales / (log_scales @ log_scales)
+
+
+_dfa_core_ready = False
+
+
+def _warmup_dfa_core():
+    """Compile (or load from the on-disk cache) the DFA kernel before first use
+    
+    Call from the GUI thread: the first parallel launch starts numba's thread
+    pool, and a TBB pool started from a worker thread hangs at interpreter exit.
+    """
+    global _dfa_core_ready
+    if HAVE_NUMBA and not _dfa_core_ready:
+        _fluctuations(np.zeros(256, dtype=np.float32), np.array([4, 8, 16], dtype=np.int64), 500)
+        _dfa_core_ready = True
 
 
 class DFAAnalysis(QWidget):
@@ -31,9 +202,31 @@ class DFAAnalysis(QWidget):
         self.scales = None
         self.fluctuations = None
         self.alpha = None
+        self.log_scales = None
+        self.log_fluctuations = None
+        
+        # Results of previous runs, keyed by data signature and parameters
+        self._dfa_cache = BoundedCache(16)
+        
+        # Background calculation state
+        self._busy = False
+        self._worker = None
+        self._worker_key = None  # cache key of the run in flight
+        
+        # Timeframe changes arrive in bursts while the timeline is dragged;
+        # only the last one within 200 ms fetches data
+        self._pending_timeframe = None
+        self._timeframe_timer = QTimer(self)
+        self._timeframe_timer.setSingleShot(True)
+        self._timeframe_timer.setInterval(200)
+        self._timeframe_timer.timeout.connect(self._apply_pending_timeframe)
         
         self.init_ui()
         
+        # Compile the DFA kernel while the UI is idle rather than on first click
+        if HAVE_NUMBA:
+            QTimer.singleShot(0, _warmup_dfa_core)
+        
     def init_ui(self):
         """Initialize the DFA analysis UI"""
         layout = QVBoxLayout(self)
@@ -46,6 +239,11 @@ class DFAAnalysis(QWidget):
         # Configure plot
         self.plot_widget.showGrid(x=True, y=True, alpha=0.3)
         
+        # Persistent plot items, updated in place with setData
+        self._points_item = self.plot_widget.plot([], [], pen=None, symbol='o', symbolSize=6,
+                                                  symbolBrush='#00bfff', symbolPen='#00bfff')
+        self._fit_item = self.plot_widget.plot([], [], pen={'color': '#ff4444', 'width': 2})
+        
         layout.addWidget(self.plot_widget)
         
     def create_controls(self):
@@ -79,6 +277,15 @@ class DFAAnalysis(QWidget):
         
         controls_layout.addLayout(scale_layout)
         
+        # Segment cap (bounds the work done per scale on long recordings)
+        segments_layout = QHBoxLayout()
+        segments_layout.addWidget(QLabel("Max Segments:"))
+        self.max_segments_spin = QSpinBox()
+        self.max_segments_spin.setRange(10, 100000)
+        self.max_segments_spin.setValue(500)
+        segments_layout.addWidget(self.max_segments_spin)
+        controls_layout.addLayout(segments_layout)
+        
         # Add spacer before analysis button
         controls_layout.addSpacing(10)  # Add 10 pixels of space
         
@@ -120,7 +327,18 @@ class DFAAnalysis(QWidget):
         self.update_data()
         
     def set_timeframe(self, start_time, end_time):
-        """Set analysis timeframe"""
+        """Set analysis timeframe (applied after a short debounce)"""
+        self._pending_timeframe = (start_time, end_time)
+        self._timeframe_timer.start()
+        
+    def _apply_pending_timeframe(self):
+        """Load data for the last requested timeframe"""
+        self._timeframe_timer.stop()
+        if self._pending_timeframe is None:
+            return
+        start_time, end_time = self._pending_timeframe
+        self._pending_timeframe = None
+        
         if self.analyzer and self.analyzer.processor:
             try:
                 # Limit maximum analysis time to 5 minutes
@@ -134,7 +352,8 @@ class DFAAnalysis(QWidget):
                 
                 data, _ = self.analyzer.processor.get_filtered_data(start_time, end_time)
                 if data is not None and len(data) > self.current_channel:
-                    self.current_data = data[self.current_channel]
+                    # One contiguous float32 copy here avoids hidden copies in the kernels
+                    self.current_data = np.ascontiguousarray(data[self.current_channel], dtype=np.float32)
                     self.sfreq = self.analyzer.processor.get_sampling_rate()
                     
                     # Update max scale based on data length
@@ -169,9 +388,10 @@ class DFAAnalysis(QWidget):
                         mid_point = len(channel_data) // 2
                         start_idx = int(mid_point - max_samples // 2)
                         end_idx = int(mid_point + max_samples // 2)
-                        self.current_data = channel_data[start_idx:end_idx]
-                    else:
-                        self.current_data = channel_data
+                        channel_data = channel_data[start_idx:end_idx]
+                    
+                    # One contiguous float32 copy here avoids hidden copies in the kernels
+                    self.current_data = np.ascontiguousarray(channel_data, dtype=np.float32)
                         
                     self.sfreq = self.analyzer.processor.get_sampling_rate()
                     
@@ -192,6 +412,9 @@ class DFAAnalysis(QWidget):
                 
     def run_analysis(self):
         """Run DFA analysis on current data"""
+        # Don't analyse stale data if a timeframe change is still pending
+        self._apply_pending_timeframe()
+        
         if self.current_data is None:
             print("Error: No data available for analysis")
             return
@@ -201,6 +424,7 @@ class DFAAnalysis(QWidget):
             min_scale = self.min_scale_spin.value()
             max_scale = self.max_scale_spin.value()
             n_scales = self.n_scales_spin.value()
+            max_segments = self.max_segments_spin.value()
             
             # Validate parameters
             if min_scale <= 0 or max_scale <= 0 or n_scales <= 0:
@@ -211,12 +435,69 @@ class DFAAnalysis(QWidget):
                 print("Error: Min scale must be less than max scale")
                 return
                 
-            # Calculate DFA
-            result = self.calculate_dfa_direct(min_scale, max_scale, n_scales)
-            if result is None:
+            # Reuse the result of an identical earlier run
+            cache_key = self._cache_key(min_scale, max_scale, n_scales, max_segments)
+            result = self._dfa_cache.get(cache_key)
+            if result is not None:
+                self._show_result(result)
                 return
                 
+            # Calculate DFA in the background so long recordings don't freeze the UI
+            if self._busy:
+                return
+            _warmup_dfa_core()  # no-op once the kernel is ready
+            self._busy = True
+            self.analyze_button.setEnabled(False)
+            self._worker_key = cache_key
+            self._worker = FunctionWorker(self.calculate_dfa_direct, min_scale, max_scale,
+                                          n_scales, max_segments, self.current_data)
+            self._worker.start(self._on_dfa_finished)
+            
+        except Exception as e:
+            print(f"Error running DFA analysis: {e}")
+            import traceback
+            traceback.print_exc()
+            
+    def _on_dfa_finished(self, result):
+        """Store and display the result of a background DFA run"""
+        cache_key = self._worker_key
+        self._busy = False
+        self._worker = self._worker_key = None
+        self.analyze_button.setEnabled(True)
+        if result is not None:
+            self._dfa_cache.put(cache_key, result)
+            
+        stale = (self.current_data is None or self._pending_timeframe is not None
+                 or cache_key != self._current_cache_key())
+        if result is None or stale:
+            # Whatever is on screen belongs to earlier data; don't leave it up
+            self._clear_result()
+            
+        # Data or parameters changed while this ran: keep the result cached,
+        # but show (calculating if needed) the one for the current settings
+        if stale:
+            if self.current_data is not None:
+                self.run_analysis()
+            return
+        if result is not None:
+            self._show_result(result)
+            
+    def _clear_result(self):
+        """Remove the displayed DFA result"""
+        self.scales = self.fluctuations = self.alpha = None
+        self.log_scales = self.log_fluctuations = None
+        self.update_plot()
+        self.alpha_label.setText("DFA α: --")
+        self.interpretation_label.setText("Interpretation: --")
+        self.interpretation_label.setStyleSheet("")
+        self.stats_text.clear()
+        
+    def _show_result(self, result):
+        """Display DFA results and notify listeners"""
+        try:
             self.scales, self.fluctuations, self.alpha = result
+            self.log_scales = np.log10(self.scales)
+            self.log_fluctuations = np.log10(self.fluctuations)
             
             # Update plot
             self.update_plot()
@@ -229,13 +510,33 @@ class DFAAnalysis(QWidget):
                 self.analysis_completed.emit(self.alpha)
             
         except Exception as e:
-            print(f"Error running DFA analysis: {e}")
+            print(f"Error displaying DFA results: {e}")
             import traceback
             traceback.print_exc()
             
-    def calculate_dfa_direct(self, min_scale, max_scale, n_scales):
-        """Calculate DFA directly without threading"""
-        if self.current_data is None:
+    def _cache_key(self, min_scale, max_scale, n_scales, max_segments):
+        """Signature of the current data plus the DFA parameters"""
+        # Hash every sample: channels and windows often share flat or
+        # zero-padded edges, and hashing is cheap next to a DFA run
+        data = self.current_data
+        signature = hash(data.tobytes())
+        return (len(data), signature, self.sfreq, min_scale, max_scale, n_scales, max_segments)
+        
+    def _current_cache_key(self):
+        """Cache key for the current data and the parameters in the controls"""
+        return self._cache_key(self.min_scale_spin.value(), self.max_scale_spin.value(),
+                               self.n_scales_spin.value(), self.max_segments_spin.value())
+        
+    def calculate_dfa_direct(self, min_scale, max_scale, n_scales, max_segments=500, data=None):
+        """Calculate DFA directly without threading
+        
+        At most ``max_segments`` evenly spaced segments are used per scale, so
+        small scales on long recordings cost O(max_segments * scale) instead of O(N).
+        ``data`` defaults to the current data.
+        """
+        if data is None:
+            data = self.current_data
+        if data is None:
             print("Error: No data available for analysis")
             return None
             
@@ -252,50 +553,24 @@ class DFAAnalysis(QWidget):
             # Ensure minimum scale is at least 4 samples
             min_scale = max(4, min_scale)
             
-            # Generate logarithmically spaced scales
+            # Generate logarithmically spaced scales; rounding repeats small scales,
+            # so keep each once, and only those that fit at least 2 segments
             scales = np.logspace(np.log10(min_scale), np.log10(max_scale), n_scales)
-            scales = np.round(scales).astype(int)
+            scales = np.unique(np.round(scales).astype(int))
+            scales = scales[scales * 2 <= len(data)]
+            
+            # Remove the mean (taken in float64) but keep the signal float32; the
+            # kernels integrate it into the profile Y(k) = sum(x_i - <x>) in float64
+            mean = np.mean(data, dtype=np.float64)
+            centered = np.subtract(data, mean, dtype=np.float32)
             
             # Calculate fluctuations for each scale
-            fluctuations = []
-            valid_scales = []
+            scale_fluctuations = _fluctuations(centered, scales.astype(np.int64), max_segments)
             
-            # Pre-calculate cumulative sum for faster processing
-            cumsum = np.cumsum(self.current_data - np.mean(self.current_data))
-            
-            for scale in scales:
-                # Divide signal into non-overlapping segments
-                n_segments = len(self.current_data) // scale
-                if n_segments < 2:
-                    continue
-                    
-                # Reshape data into segments
-                segments = cumsum[:n_segments * scale].reshape(n_segments, scale)
-                
-                # Calculate local trends using vectorized operations
-                x = np.arange(scale)
-                x_centered = x - np.mean(x)
-                x_centered_squared = np.sum(x_centered ** 2)
-                
-                # Calculate trends for all segments at once
-                y_centered = segments - np.mean(segments, axis=1, keepdims=True)
-                slope = np.sum(x_centered * y_centered, axis=1) / x_centered_squared
-                intercept = np.mean(segments, axis=1) - slope * np.mean(x)
-                
-                # Calculate trends using broadcasting
-                trends = slope[:, np.newaxis] * x + intercept[:, np.newaxis]
-                
-                # Detrend segments
-                detrended = segments - trends
-                
-                # Calculate root mean square fluctuation
-                rms = np.sqrt(np.mean(detrended ** 2, axis=1))
-                mean_rms = np.mean(rms)
-                
-                # Only include valid fluctuations
-                if np.isfinite(mean_rms) and mean_rms > 0:
-                    fluctuations.append(mean_rms)
-                    valid_scales.append(scale)
+            # Only include valid fluctuations (scales with < 2 segments come back NaN)
+            valid = np.isfinite(scale_fluctuations) & (scale_fluctuations > 0)
+            fluctuations = scale_fluctuations[valid]
+            valid_scales = scales[valid]
             
             # Check if we have enough valid points for analysis
             if len(valid_scales) < 2:
@@ -312,11 +587,9 @@ class DFAAnalysis(QWidget):
                 return None
             
             # Fit line to log-log plot
-            reg = LinearRegression()
-            reg.fit(log_scales.reshape(-1, 1), log_fluctuations)
-            alpha = reg.coef_[0]
+            alpha = np.polyfit(log_scales, log_fluctuations, 1)[0]
             
-            return np.array(valid_scales), np.array(fluctuations), alpha
+            return valid_scales, fluctuations, alpha
             
         except Exception as e:
             print(f"Error calculating DFA: {e}")
@@ -326,27 +599,25 @@ class DFAAnalysis(QWidget):
             
     def update_plot(self):
         """Update the DFA plot"""
-        self.plot_widget.clear()
-        
-        if self.scales is None or self.fluctuations is None:
+        if self.log_scales is None or self.log_fluctuations is None:
+            self._points_item.setData([], [])
+            self._fit_item.setData([], [])
             return
             
         # Plot fluctuations vs scales in log-log space
-        log_scales = np.log10(self.scales)
-        log_fluctuations = np.log10(self.fluctuations)
+        log_scales = self.log_scales
+        log_fluctuations = self.log_fluctuations
         
         # Plot data points
-        self.plot_widget.plot(log_scales, log_fluctuations, 
-                            pen=None, symbol='o', symbolSize=6, 
-                            symbolBrush='#00bfff', symbolPen='#00bfff')
+        self._points_item.setData(log_scales, log_fluctuations)
         
         # Plot fitted line
         if not np.isnan(self.alpha):
             # Calculate fitted line
             fitted_line = self.alpha * log_scales + (np.mean(log_fluctuations) - self.alpha * np.mean(log_scales))
-            self.plot_widget.plot(log_scales, fitted_line, 
-                                pen={'color': '#ff4444', 'width': 2}, 
-                                name=f'α = {self.alpha:.3f}')
+            self._fit_item.setData(log_scales, fitted_line)
+        else:
+            self._fit_item.setData([], [])
             
         # Set axis ranges
         if len(log_scales) > 0 and len(log_fluctuations) > 0:
@@ -3,13 +3,58 @@ EEG Timeline Analysis
 Main EEG signal display as an analysis tab - Fixed and Enhanced
 """
 
+import logging
 import numpy as np
 import pyqtgraph as pg
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QSpinBox, QPushButton, QCheckBox, QGroupBox,
                              QScrollArea, QFrame, QDoubleSpinBox)
-from PyQt5.QtCore import pyqtSignal, Qt
-from utils.ui_helpers import setup_dark_plot
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer, QSignalBlocker
+from utils.ui_helpers import setup_dark_plot, enable_opengl
+from utils.styles import TIMELINE_QSS, CHANNEL_COLORS
+from utils._njit import HAVE_NUMBA, njit, prange
+from utils.workers import FunctionWorker
+from utils.cache import BoundedCache
+
+# Progress messages are debug-level; redraws can run at tens of Hz
+logger = logging.getLogger(__name__)
+
+
+# Explicit signatures: compiled (or loaded from the on-disk cache) at import,
+# so the first redraw after loading a file does not stall on the JIT
+@njit(['void(float64[:, :], int64[::1], float32, float32, float32[:, ::1])',
+       'void(float32[:, :], int64[::1], float32, float32, float32[:, ::1])'],
+      cache=True, parallel=True, fastmath=True)
+def _stack_channels(data, visible_idx, gain, spacing, out):
+    """Multiply each visible channel by gain and offset it to its row, in one pass"""
+    for v in prange(visible_idx.shape[0]):
+        channel = visible_idx[v]
+        offset = v * spacing
+        for s in range(data.shape[1]):
+            out[v, s] = data[channel, s] * gain + offset
+
+
+def _stack_visible(data, visible_idx, gain, spacing, out):
+    """Fill out[v] with visible channel v scaled by gain and offset for display"""
+    if HAVE_NUMBA and data.dtype in (np.float32, np.float64):
+        _stack_channels(data, visible_idx, gain, spacing, out)
+    else:
+        np.multiply(data[visible_idx], gain, out=out)
+        out += (np.arange(len(visible_idx)) * spacing)[:, None]
+    return out
+
+
+def _fetch_window(processor, start_time, end_time):
+    """Filtered data of a window as channel-major float32 microvolts, with its times"""
+    data, times = processor.get_filtered_data(start_time, end_time)
+    if data is not None:
+        if data.ndim == 2 and data.shape[0] == len(times) != data.shape[1]:
+            data = data.T  # sample-major; stored channel-major below
+        # Converted to float32 microvolts once here, off the GUI thread:
+        # cached windows never need rescaling, and take half the memory.
+        # C order keeps each channel's samples contiguous for stacking
+        data = np.multiply(data, np.float32(1e6), dtype=np.float32, order='C')
+    return data, times
 
 
 class EEGTimelineAnalysis(QWidget):
@@ -19,6 +64,12 @@ class EEGTimelineAnalysis(QWidget):
     time_changed = pyqtSignal(float)  # current time position
     channel_visibility_changed = pyqtSignal(int, bool)  # channel, visible
     
+    # Channel colors
+    CHANNEL_COLORS = CHANNEL_COLORS
+    
+    # Channel checkboxes are created this many at a time as the list scrolls
+    CHECKBOX_BATCH = 20
+    
     def __init__(self):
         super().__init__()
         self.analyzer = None
@@ -27,11 +78,45 @@ class EEGTimelineAnalysis(QWidget):
         self.duration = 0
         self.y_scale = 50  # microvolts - changed from 200 to 50
         self.spacing = 2.5   # spacing multiplier - changed from 1 to 2.5
-        self.visible_channels = {}
+        self.visible_mask = np.zeros(0, dtype=bool)  # Per-channel visibility
         self.channel_names = []
         self.start_time = 0
         self.end_time = 0
         self.controls_visible = True  # Track controls visibility
+        self._stack_buf = np.empty(0, dtype=np.float32)  # Reused output of _stack_visible
+        self._curves = []  # One persistent plot item per channel
+        self._checkboxes = []  # Channel checkboxes built so far
+        self._controls_signature = None  # Channel names the controls were built for
+        self._pens = []
+        
+        # View ranges last applied, so unchanged ranges are not re-applied
+        self._applied_xrange = None
+        self._applied_yrange = None
+        
+        # Window currently on screen, as returned by _cached_window
+        self._raw_window = None
+        self._raw_times = None
+        self._raw_key = None
+        
+        # Recently fetched windows: (start, end) -> (data in μV, times)
+        self._win_cache = BoundedCache(8)
+        
+        # Background fetch in flight, if any
+        self._fetch_worker = None
+        
+        # Once the view has been idle for a moment, fetch the neighbouring
+        # windows so the next step along the timeline is a cache hit
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(150)
+        self._prefetch_timer.timeout.connect(self._prefetch_adjacent)
+        
+        # Bursts of changes (slider drags, held spinbox arrows, Select All)
+        # collapse into one redraw at most every 30 ms
+        self._redraw_timer = QTimer(self)
+        self._redraw_timer.setSingleShot(True)
+        self._redraw_timer.setInterval(30)
+        self._redraw_timer.timeout.connect(self.update_plot)
         
         self.init_ui()
         
@@ -40,10 +125,27 @@ class EEGTimelineAnalysis(QWidget):
         main_layout = QHBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
         
+        # One sheet for the whole tab; children inherit it instead of each
+        # parsing its own copy
+        self.setStyleSheet(TIMELINE_QSS)
+        
         # Create plot widget first (now on the left)
         self.plot_widget = pg.PlotWidget()
         setup_dark_plot(self.plot_widget, "Time (seconds)", "Amplitude (μV)")
         self.plot_widget.showGrid(x=True, y=True, alpha=0.3)
+
+        # Draw about one min/max pair per pixel column instead of every sample
+        self.plot_widget.setDownsampling(auto=True, mode='peak')
+        self.plot_widget.setClipToView(True)
+        
+        # Ranges are always set explicitly; don't track data bounds on setData
+        self.plot_widget.disableAutoRange()
+        
+        # Channels are stacked at fixed offsets, so only pan/zoom in time
+        self.plot_widget.getViewBox().setMouseEnabled(x=True, y=False)
+        
+        # Rasterize the traces on the GPU; stays on QPainter without a GL context
+        enable_opengl(self.plot_widget)
         main_layout.addWidget(self.plot_widget, stretch=1)
         
         # Right panel for controls
@@ -53,22 +155,8 @@ class EEGTimelineAnalysis(QWidget):
         
         # Toggle controls button
         self.toggle_controls_btn = QPushButton("◀")
+        self.toggle_controls_btn.setObjectName("toggleControls")
         self.toggle_controls_btn.setFixedSize(20, 20)
-        self.toggle_controls_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #4a4a4a;
-                border: 1px solid #666666;
-                color: #ffffff;
-                border-radius: 3px;
-                font-size: 10px;
-            }
-            QPushButton:hover {
-                background-color: #555555;
-            }
-            QPushButton:pressed {
-                background-color: #333333;
-            }
-        """)
         self.toggle_controls_btn.clicked.connect(self.toggle_controls)
         
         # Add toggle button to main layout
@@ -76,22 +164,6 @@ class EEGTimelineAnalysis(QWidget):
         
         # Channel Visibility Group
         channels_group = QGroupBox("Channel Visibility")
-        channels_group.setStyleSheet("""
-            QGroupBox {
-                font-weight: bold;
-                color: #ffffff;
-                border: 1px solid #555555;
-                border-radius: 5px;
-                margin-top: 10px;
-                padding-top: 10px;
-                background-color: #3c3c3c;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px 0 5px;
-            }
-        """)
         
         channels_layout = QVBoxLayout(channels_group)
         
@@ -100,25 +172,6 @@ class EEGTimelineAnalysis(QWidget):
         self.select_all_btn = QPushButton("Select All")
         self.select_none_btn = QPushButton("None")
         
-        button_style = """
-            QPushButton {
-                background-color: #4a4a4a;
-                border: 1px solid #666666;
-                color: #ffffff;
-                padding: 4px 8px;
-                border-radius: 3px;
-                font-size: 11px;
-            }
-            QPushButton:hover {
-                background-color: #555555;
-            }
-            QPushButton:pressed {
-                background-color: #333333;
-            }
-        """
-        self.select_all_btn.setStyleSheet(button_style)
-        self.select_none_btn.setStyleSheet(button_style)
-        
         self.select_all_btn.clicked.connect(self.select_all_channels)
         self.select_none_btn.clicked.connect(self.select_no_channels)
         
@@ -135,48 +188,16 @@ class EEGTimelineAnalysis(QWidget):
         scroll_area = QScrollArea()
         scroll_area.setWidget(self.channels_container)
         scroll_area.setWidgetResizable(True)
-        scroll_area.setStyleSheet("""
-            QScrollArea {
-                border: none;
-                background-color: transparent;
-            }
-            QScrollBar:vertical {
-                border: none;
-                background: #2b2b2b;
-                width: 10px;
-                margin: 0px;
-            }
-            QScrollBar::handle:vertical {
-                background: #555555;
-                min-height: 20px;
-                border-radius: 5px;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                height: 0px;
-            }
-        """)
         channels_layout.addWidget(scroll_area)
+        self._channels_scroll = scroll_area
+        scroll_bar = scroll_area.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self._on_channels_scrolled)
+        scroll_bar.rangeChanged.connect(self._on_channels_scrolled)
         
         controls_layout.addWidget(channels_group)
         
         # Display Controls Group
         display_group = QGroupBox("Display")
-        display_group.setStyleSheet("""
-            QGroupBox {
-                font-weight: bold;
-                color: #ffffff;
-                border: 1px solid #555555;
-                border-radius: 5px;
-                margin-top: 10px;
-                padding-top: 10px;
-                background-color: #3c3c3c;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px 0 5px;
-            }
-        """)
         
         display_layout = QVBoxLayout(display_group)
         
@@ -188,16 +209,6 @@ class EEGTimelineAnalysis(QWidget):
         self.y_scale_spinbox.setValue(self.y_scale)
         self.y_scale_spinbox.setSuffix(" μV")
         self.y_scale_spinbox.valueChanged.connect(self.on_y_scale_changed)
-        self.y_scale_spinbox.setStyleSheet("""
-            QSpinBox {
-                background-color: #3c3c3c;
-                border: 1px solid #555555;
-                color: #ffffff;
-                padding: 2px;
-                border-radius: 3px;
-                min-width: 60px;
-            }
-        """)
         y_scale_layout.addWidget(self.y_scale_spinbox)
         display_layout.addLayout(y_scale_layout)
         
@@ -210,16 +221,6 @@ class EEGTimelineAnalysis(QWidget):
         self.spacing_spinbox.setValue(self.spacing)
         self.spacing_spinbox.setSuffix("x")
         self.spacing_spinbox.valueChanged.connect(self.on_spacing_changed)
-        self.spacing_spinbox.setStyleSheet("""
-            QDoubleSpinBox {
-                background-color: #3c3c3c;
-                border: 1px solid #555555;
-                color: #ffffff;
-                padding: 2px;
-                border-radius: 3px;
-                min-width: 60px;
-            }
-        """)
         spacing_layout.addWidget(self.spacing_spinbox)
         display_layout.addLayout(spacing_layout)
         
@@ -237,40 +238,50 @@ class EEGTimelineAnalysis(QWidget):
         
     def select_all_channels(self):
         """Select all channels"""
-        for i in range(len(self.channel_names)):
-            self.visible_channels[i] = True
+        changed = np.flatnonzero(~self.visible_mask)
+        self.visible_mask[:] = True
             
-        # Update checkboxes
-        for i in range(self.channels_layout.count() - 1):  # -1 for stretch
-            item = self.channels_layout.itemAt(i)
-            if item and item.widget() and isinstance(item.widget(), QCheckBox):
-                item.widget().setChecked(True)
+        self._set_checkboxes(True)
+        for channel_idx in changed:
+            self.channel_visibility_changed.emit(int(channel_idx), True)
                 
-        self.update_plot()
+        self.schedule_update()
         
     def select_no_channels(self):
         """Deselect all channels"""
-        for i in range(len(self.channel_names)):
-            self.visible_channels[i] = False
+        changed = np.flatnonzero(self.visible_mask)
+        self.visible_mask[:] = False
             
-        # Update checkboxes
-        for i in range(self.channels_layout.count() - 1):  # -1 for stretch
-            item = self.channels_layout.itemAt(i)
-            if item and item.widget() and isinstance(item.widget(), QCheckBox):
-                item.widget().setChecked(False)
+        self._set_checkboxes(False)
+        for channel_idx in changed:
+            self.channel_visibility_changed.emit(int(channel_idx), False)
                 
-        self.update_plot()
+        self.schedule_update()
+        
+    def _set_checkboxes(self, checked):
+        """Check or uncheck every built checkbox with one repaint and no signals"""
+        self.channels_container.setUpdatesEnabled(False)
+        for checkbox in self._checkboxes:
+            checkbox.blockSignals(True)
+            checkbox.setChecked(checked)
+            checkbox.blockSignals(False)
+        self.channels_container.setUpdatesEnabled(True)
         
     def on_y_scale_changed(self, value):
         """Handle Y-scale changes"""
         self.y_scale = value
-        self.update_plot()
+        self.schedule_update()
         
     def on_spacing_changed(self, value):
         """Handle spacing changes"""
         self.spacing = value
-        self.update_plot()
+        self.schedule_update()
         
+    def _move_time_line(self, position):
+        """Move the time line without echoing the move back as time_changed"""
+        with QSignalBlocker(self.time_line):
+            self.time_line.setPos(position)
+            
     def on_time_line_moved(self, line):
         """Handle time line movement"""
         new_time = line.pos().x()
@@ -278,30 +289,37 @@ class EEGTimelineAnalysis(QWidget):
             self.current_time = new_time
             self.time_changed.emit(new_time)
         
+    def _on_checkbox_state(self, state):
+        """Route a channel checkbox toggle to on_channel_visibility_changed"""
+        self.on_channel_visibility_changed(self.sender().property("channel"), bool(state))
+        
     def on_channel_visibility_changed(self, channel_idx, checked):
         """Handle channel visibility changes"""
-        self.visible_channels[channel_idx] = checked
-        self.update_plot()
+        self.visible_mask[channel_idx] = bool(checked)
+        self.schedule_update()
         self.channel_visibility_changed.emit(channel_idx, checked)
         
     def set_analyzer(self, analyzer):
         """Set the EEG analyzer"""
-        print(f"🔄 EEG Timeline: Setting analyzer...")
+        logger.debug("🔄 EEG Timeline: Setting analyzer...")
         self.analyzer = analyzer
+        self._win_cache.clear()
+        self._raw_key = None
+        self._applied_xrange = self._applied_yrange = None  # New data: reset the view
         if analyzer and hasattr(analyzer, "processor") and analyzer.processor:
             self.duration = analyzer.processor.get_duration()
             self.channel_names = analyzer.processor.get_channel_names()
-            print(f"📊 EEG Timeline: Duration={self.duration:.1f}s, Channels={len(self.channel_names)}")
+            logger.debug("📊 EEG Timeline: Duration=%.1fs, Channels=%d", self.duration, len(self.channel_names))
             
             # Initialize timeframe to full duration
             self.start_time = 0
             self.end_time = self.duration
             
             self.setup_channel_controls()
-            print(f"✅ EEG Timeline: Analyzer set successfully")
+            logger.debug("✅ EEG Timeline: Analyzer set successfully")
         else:
-            print(f"❌ EEG Timeline: No analyzer or processor available")
-        self.update_plot()
+            logger.warning("❌ EEG Timeline: No analyzer or processor available")
+        self.schedule_update()
         
     def set_channel(self, channel_idx):
         """Set the current channel"""
@@ -314,176 +332,319 @@ class EEGTimelineAnalysis(QWidget):
         
         # Only update time line position if within current timeframe
         if self.start_time <= self.current_time <= self.end_time:
-            self.time_line.setPos(self.current_time)
+            self._move_time_line(self.current_time)
             
         # Update plot with current timeframe
-        self.update_plot()
+        self.schedule_update()
         
     def set_timeframe(self, start_time, end_time):
         """Set analysis timeframe"""
-        print(f"🔄 EEG Timeline: Setting timeframe {start_time:.1f}s - {end_time:.1f}s")
+        logger.debug("🔄 EEG Timeline: Setting timeframe %.1fs - %.1fs", start_time, end_time)
         self.start_time = start_time
         self.end_time = end_time
         
         # Update plot X-axis range
-        self.plot_widget.setXRange(start_time, end_time, padding=0)
+        self._set_view_range(x_range=(start_time, end_time))
         
         # Update time line position if needed
         if self.current_time < start_time:
             self.current_time = start_time
-            self.time_line.setPos(start_time)
+            self._move_time_line(start_time)
         elif self.current_time > end_time:
             self.current_time = end_time
-            self.time_line.setPos(end_time)
+            self._move_time_line(end_time)
             
         # Force plot update with new timeframe
-        self.update_plot()
+        self.schedule_update()
         
     def setup_channel_controls(self):
         """Setup channel visibility controls"""
-        # Clear existing controls
-        for i in reversed(range(self.channels_layout.count())):
-            item = self.channels_layout.itemAt(i)
-            if item:
-                widget = item.widget()
-                if widget:
-                    widget.setParent(None)
+        signature = tuple(self.channel_names)
+        if signature == self._controls_signature:
+            # Same montage (e.g. only the filter changed): keep the widgets
+            # and just reset them to no channels visible
+            self.visible_mask[:] = False
+            self._set_checkboxes(False)
+            for curve in self._curves:
+                if curve is not None:
+                    curve.setVisible(False)
+            logger.debug("🎛️ EEG Timeline: Reusing controls for %d channels", len(self.channel_names))
+            return
             
-        # Reset visible channels dictionary
-        self.visible_channels = {}
-        
-        # Channel colors
-        colors = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", 
-                 "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+        # Clear existing controls (checkboxes and the trailing stretch)
+        while self.channels_layout.count():
+            item = self.channels_layout.takeAt(0)
+            if item.widget():
+                item.widget().setParent(None)
+        self._checkboxes = []
+            
+        # Reset visibility; no channels visible by default
+        self.visible_mask = np.zeros(len(self.channel_names), dtype=bool)
         
-        # Add channel checkboxes
-        for i, name in enumerate(self.channel_names):
+        # Checkboxes are built in batches as the list is scrolled, since
+        # stylesheet parsing dominates widget creation on large montages
+        self.channels_layout.addStretch()
+        self._channels_scroll.verticalScrollBar().setValue(0)
+        self._build_channel_checkboxes()
+        
+        # Pens are built once per channel rather than on every redraw
+        colors = self.CHANNEL_COLORS
+        self._pens = [pg.mkPen(color=colors[i % len(colors)], width=1)
+                      for i in range(len(self.channel_names))]
+        
+        # One curve per channel, reused by update_plot through setData; created
+        # when the channel is first shown so hidden channels add no scene items
+        for curve in self._curves:
+            if curve is not None:
+                self.plot_widget.removeItem(curve)
+        self._curves = [None] * len(self.channel_names)
+        self._controls_signature = signature
+        
+        logger.debug("🎛️ EEG Timeline: Setup %d channels, %d visible",
+                     len(self.channel_names), np.count_nonzero(self.visible_mask))
+        
+    def _build_channel_checkboxes(self):
+        """Create the next batch of channel checkboxes"""
+        colors = self.CHANNEL_COLORS
+        start = len(self._checkboxes)
+        stop = min(start + self.CHECKBOX_BATCH, len(self.channel_names))
+        
+        # Lay out and repaint the list once per batch, not once per checkbox
+        self.channels_container.setUpdatesEnabled(False)
+        for i in range(start, stop):
+            name = self.channel_names[i]
             clean_name = name.replace("EEG ", "") if name.startswith("EEG ") else name
             
             checkbox = QCheckBox(f"{i+1}: {clean_name}")
-            checkbox.setChecked(False)  # No channels visible by default
-            checkbox.stateChanged.connect(
-                lambda state, idx=i: self.on_channel_visibility_changed(idx, state)
-            )
+            checkbox.setChecked(bool(self.visible_mask[i]))
+            checkbox.setProperty("channel", i)
+            checkbox.stateChanged.connect(self._on_checkbox_state)
             
-            color = colors[i % len(colors)]
-            checkbox.setStyleSheet(f"""
-                QCheckBox {{
-                    color: {color};
-                    font-weight: bold;
-                    spacing: 5px;
-                    background-color: #3c3c3c;
-                    padding: 2px;
-                }}
-                QCheckBox::indicator {{
-                    width: 13px;
-                    height: 13px;
-                }}
-                QCheckBox::indicator:checked {{
-                    background-color: {color};
-                    border: 1px solid {color};
-                }}
-                QCheckBox::indicator:unchecked {{
-                    background-color: #3c3c3c;
-                    border: 1px solid #555555;
-                }}
-            """)
+            # Coloured by TIMELINE_QSS through this property, so no
+            # per-checkbox style sheet has to be parsed
+            checkbox.setProperty("ch", str(i % len(colors)))
             
-            self.visible_channels[i] = False  # No channels visible by default
-            self.channels_layout.addWidget(checkbox)
+            # Keep the stretch last
+            self.channels_layout.insertWidget(i, checkbox)
+            self._checkboxes.append(checkbox)
+        self.channels_container.setUpdatesEnabled(True)
             
-        self.channels_layout.addStretch()
-        
-        visible_count = sum(1 for v in self.visible_channels.values() if v)
-        print(f"🎛️ EEG Timeline: Setup {len(self.channel_names)} channels, {visible_count} visible")
-        
+        # Fill the view once the layout has settled
+        if stop < len(self.channel_names):
+            QTimer.singleShot(0, self._on_channels_scrolled)
+            
+    def _on_channels_scrolled(self, *args):
+        """Build more checkboxes when the list is scrolled near its end"""
+        if len(self._checkboxes) >= len(self.channel_names) or not self._channels_scroll.isVisible():
+            return
+        scroll_bar = self._channels_scroll.verticalScrollBar()
+        if scroll_bar.value() >= scroll_bar.maximum() - scroll_bar.pageStep() // 2:
+            self._build_channel_checkboxes()
+            
+    def showEvent(self, event):
+        """Build the checkboxes needed to fill the channel list once shown"""
+        super().showEvent(event)
+        self._on_channels_scrolled()
+        
+    def schedule_update(self):
+        """Redraw the plot once pending changes have settled"""
+        self._redraw_timer.start()
+        
+    def _cached_window(self, start_time, end_time):
+        """Cached (data, times) for a window, sliced from a cached window that covers it, or None"""
+        key = (round(start_time, 2), round(end_time, 2))
+        if key in self._win_cache:
+            return self._win_cache[key]
+            
+        # Same sample bounds as processor.get_filtered_data
+        sfreq = self.analyzer.processor.get_sampling_rate()
+        first, stop = int(start_time * sfreq), int(end_time * sfreq)
+        for data, times in self._win_cache.values():
+            if len(times) == 0:
+                continue
+            offset = int(round(times[0] * sfreq))
+            if offset <= first and stop <= offset + len(times):
+                return data[:, first - offset:stop - offset], times[first - offset:stop - offset]
+        return None
+        
+    def _store_window(self, start_time, end_time, data, times):
+        """Add a fetched window to the cache, evicting the oldest"""
+        self._win_cache.put((round(start_time, 2), round(end_time, 2)), (data, times))
+        
+    def _start_fetch(self, start_time, end_time):
+        """Fetch a window in the background; update_plot runs again when it arrives"""
+        if self._fetch_worker is not None:
+            return  # the finished handler redraws, fetching the latest timeframe if needed
+        self._fetch_worker = FunctionWorker(_fetch_window, self.analyzer.processor, start_time, end_time)
+        self._fetch_worker.start(self._on_fetch_finished)
+        
+    def _on_fetch_finished(self, result):
+        """Cache a fetched window and redraw"""
+        worker, self._fetch_worker = self._fetch_worker, None
+        processor, start_time, end_time = worker.args
+        data, times = result if result is not None else (None, None)
+        if not self.analyzer or processor is not self.analyzer.processor:
+            # Stale fetch from a previous recording; the fetch for the current
+            # one was turned away while this was in flight, so start it now
+            if self.analyzer:
+                self.schedule_update()
+            return
+        if data is None or len(data) == 0:
+            logger.warning("⚠️ EEG Timeline: No data available for plotting")
+            # A failed prefetch may likewise have turned the current timeframe
+            # away; don't retry the current timeframe itself
+            if (start_time, end_time) != (self.start_time, self.end_time):
+                self.schedule_update()
+            return
+        self._store_window(start_time, end_time, data, times)
+        if self._raw_key != (self.start_time, self.end_time):
+            self.update_plot()
+        else:
+            self._prefetch_timer.start()  # a prefetch landed; continue with the next one
+            
+    def _prefetch_adjacent(self):
+        """Fetch the windows just before and after the current one if not cached"""
+        if not self.analyzer or self._fetch_worker is not None:
+            return
+        width = self.end_time - self.start_time
+        neighbours = []
+        if self.start_time > 0:
+            neighbours.append((max(0, self.start_time - width), self.start_time))
+        if self.end_time < self.duration:
+            neighbours.append((self.end_time, min(self.duration, self.end_time + width)))
+        for start_time, end_time in neighbours:
+            if self._cached_window(start_time, end_time) is None:
+                self._start_fetch(start_time, end_time)
+                return
+                
     def update_plot(self):
         """Update the EEG timeline plot"""
+        self._redraw_timer.stop()
         if not self.analyzer:
-            print("⚠️ EEG Timeline: No analyzer available for plot update")
+            logger.debug("⚠️ EEG Timeline: No analyzer available for plot update")
             return
             
-        try:
-            # Clear existing plot items (except time line)
-            items = self.plot_widget.getPlotItem().items[:]
-            for item in items:
-                if item != self.time_line:
-                    self.plot_widget.removeItem(item)
-            
-            # Get data for current timeframe
-            if self.start_time == 0 and self.end_time == 0:
-                # If no timeframe set, use full duration
-                self.start_time = 0
-                self.end_time = self.duration
-                
-            print(f"📊 EEG Timeline: Getting data for timeframe {self.start_time:.1f}s - {self.end_time:.1f}s")
-            data, times = self.analyzer.processor.get_filtered_data(self.start_time, self.end_time)
+        if not self.visible_mask.any():
+            # Nothing to draw, so don't load (or prefetch) any data
+            for curve in self._curves:
+                if curve is not None:
+                    curve.setVisible(False)
+            logger.debug("⚠️ EEG Timeline: No visible channels to plot (total channels: %d)",
+                         len(self.channel_names))
+            return
             
-            if data is None or len(data) == 0:
-                print("⚠️ EEG Timeline: No data available for plotting")
+        try:
+            # Only a timeframe change needs new data; scale, spacing and
+            # visibility changes restack the window that is already loaded
+            if not self._refetch():
                 return
+            self._restack()
+            self._redraw()
+            self._prefetch_timer.start()
                 
-            print(f"📊 EEG Timeline: Got data - channels={data.shape[0]}, samples={data.shape[1]}")
-                
-            # Convert to microvolts
-            data = data * 1e6
+        except Exception:
+            logger.exception("❌ Error updating EEG timeline plot")
             
-            # Channel colors
-            colors = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", 
-                     "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+    def _refetch(self):
+        """Load data for the current timeframe unless it is already loaded"""
+        if self.start_time == 0 and self.end_time == 0:
+            # If no timeframe set, use full duration
+            self.start_time = 0
+            self.end_time = self.duration
             
-            # Plot visible channels
-            visible_count = 0
-            for channel_idx in range(len(self.channel_names)):
-                if not self.visible_channels.get(channel_idx, False):
-                    continue
-                    
-                channel_data = data[channel_idx]
-                
-                # Normalize and offset for display
-                normalized_data = channel_data / self.y_scale
-                offset_data = normalized_data + (visible_count * self.spacing)
-                
-                # Plot
-                color = colors[channel_idx % len(colors)]
-                pen = pg.mkPen(color=color, width=1)
-                
-                # Plot the data with explicit x and y values
-                self.plot_widget.plot(x=times, y=offset_data, pen=pen)
-                
-                visible_count += 1
+        key = (self.start_time, self.end_time)
+        if key == self._raw_key:
+            return True
             
-            # Set plot ranges
-            if visible_count > 0:
-                # Set X range to match timeframe
-                self.plot_widget.setXRange(self.start_time, self.end_time, padding=0)
-                
-                # Set Y range based on number of visible channels
-                y_min = -self.spacing
-                y_max = visible_count * self.spacing
-                self.plot_widget.setYRange(y_min, y_max, padding=0.1)
+        # Fetch in the background unless a cached window covers the timeframe
+        cached = self._cached_window(self.start_time, self.end_time)
+        if cached is None:
+            logger.debug("📊 EEG Timeline: Getting data for timeframe %.1fs - %.1fs", self.start_time, self.end_time)
+            self._start_fetch(self.start_time, self.end_time)
+            return False
+        data, times = cached
+        
+        logger.debug("📊 EEG Timeline: Got data - channels=%d, samples=%d", data.shape[0], data.shape[1])
+        # The absolute time axis arrives with the window (a view when sliced from
+        # the cache) and is shared by every curve until the timeframe changes
+        self._raw_window, self._raw_times, self._raw_key = data, times, key
+        return True
+        
+    def _restack(self):
+        """Scale and offset the visible channels of the loaded window"""
+        # Normalize and offset all visible channels for display in one pass;
+        # float32 is plenty for display and halves the traffic
+        data = self._raw_window
+        self._visible = self.visible_mask.copy()
+        self._visible[data.shape[0]:] = False  # The kernel does no bounds checking
+        self._visible_idx = np.flatnonzero(self._visible)
+        size = len(self._visible_idx) * data.shape[1]
+        if self._stack_buf.size < size:
+            self._stack_buf = np.empty(size, dtype=np.float32)
+        self._stacked = _stack_visible(data, self._visible_idx, np.float32(1.0 / self.y_scale),
+                                       np.float32(self.spacing),
+                                       self._stack_buf[:size].reshape(len(self._visible_idx), data.shape[1]))
+        
+    def _redraw(self):
+        """Push the stacked channels to their curves and update the view"""
+        # Hide the curves of unchecked channels, then update the visible ones
+        for channel_idx in np.flatnonzero(~self._visible):
+            curve = self._curves[channel_idx]
+            if curve is not None:
+                curve.setVisible(False)
                 
-                print(f"✅ EEG Timeline: Plotted {visible_count} visible channels ({self.start_time:.1f}s - {self.end_time:.1f}s)")
-            else:
-                print(f"⚠️ EEG Timeline: No visible channels to plot (total channels: {len(self.channel_names)})")
-                
-            # Update time line position
-            self.time_line.setPos(self.current_time)
-                
-        except Exception as e:
-            print(f"❌ Error updating EEG timeline plot: {e}")
-            import traceback
-            traceback.print_exc()
+        for row, channel_idx in enumerate(self._visible_idx):
+            curve = self._curves[channel_idx]
+            if curve is None:
+                # Filtered EEG is always finite, so skip pyqtgraph's per-frame NaN scan;
+                # aliased lines are far cheaper to rasterize with dozens of stacked traces
+                curve = pg.PlotDataItem(pen=self._pens[channel_idx], connect='all',
+                                        skipFiniteCheck=True, antialias=False)
+                # Traces are display-only; don't hit-test them on every mouse move
+                curve.curve.setClickable(False)
+                curve.setAcceptHoverEvents(False)
+                curve.curve.setAcceptHoverEvents(False)
+                self.plot_widget.addItem(curve)
+                self._curves[channel_idx] = curve
+            curve.setData(self._raw_times, self._stacked[row])
+            curve.setVisible(True)
+            
+        # Set plot ranges
+        visible_count = len(self._visible_idx)
+        if visible_count > 0:
+            # X range matches the timeframe, Y range the number of visible channels
+            self._set_view_range(x_range=(self.start_time, self.end_time),
+                                 y_range=(-self.spacing, visible_count * self.spacing))
+            
+            logger.debug("✅ EEG Timeline: Plotted %d visible channels (%.1fs - %.1fs)",
+                         visible_count, self.start_time, self.end_time)
+        else:
+            logger.debug("⚠️ EEG Timeline: No visible channels to plot (total channels: %d)",
+                         len(self.channel_names))
+            
+        # Update time line position
+        self._move_time_line(self.current_time)
+        
+    def _set_view_range(self, x_range=None, y_range=None):
+        """Apply the given view ranges unless they are already applied"""
+        if x_range is not None and x_range != self._applied_xrange:
+            self.plot_widget.setXRange(*x_range, padding=0)
+            self._applied_xrange = x_range
+        if y_range is not None and y_range != self._applied_yrange:
+            self.plot_widget.setYRange(*y_range, padding=0.1)
+            self._applied_yrange = y_range
             
     def clear_plot(self):
         """Clear the plot"""
-        self.plot_widget.clear()
-        # Re-add time line
-        self.time_line = pg.InfiniteLine(pos=0, angle=90, pen=pg.mkPen(color="#00ff00", width=2, style=2))
-        self.plot_widget.addItem(self.time_line)
+        # Empty the persistent curves; the time line stays as created in init_ui
+        for curve in self._curves:
+            if curve is not None:
+                curve.setData([], [])
+        self._move_time_line(self.current_time)
 
     def toggle_controls(self):
         """Toggle visibility of controls panel"""
         self.controls_visible = not self.controls_visible
         self.controls_panel.setVisible(self.controls_visible)
+        self._on_channels_scrolled()
         self.toggle_controls_btn.setText("▶" if not self.controls_visible else "◀")
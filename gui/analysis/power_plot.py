@@ -3,16 +3,53 @@ Power Plot
 Frequency band power visualization widget - Fixed for all bands
 """
 
+import logging
 import numpy as np
 import pyqtgraph as pg
 from PyQt5.QtWidgets import QWidget, QVBoxLayout
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import Qt, QTimer
 from utils.ui_helpers import setup_dark_plot
+from utils.workers import FunctionWorker
+from utils.cache import BoundedCache
+
+logger = logging.getLogger(__name__)
+
+
+def _y_max(power_data):
+    """Largest power value in one pass, 1 when there is no positive value"""
+    y_max = float(np.max(power_data))
+    return y_max if y_max > 0 else 1.0
+
+
+def _calculate_band_power(analyzer, key):
+    """Band power for a (channel, band, start, end) key"""
+    channel_idx, band_name, start_time, end_time = key
+    return analyzer.calculate_band_power(
+        band_name,
+        channel_idx=channel_idx,
+        start_time=start_time,
+        end_time=end_time
+    )
 
 
 class PowerPlot(QWidget):
     """Frequency band power plot widget"""
     
+    # Band colors
+    BAND_COLORS = {
+        'Alpha': '#ff9800',    # Orange
+        'Beta': '#2196f3',     # Blue
+        'Theta': '#9c27b0',    # Purple
+        'Delta': '#4caf50',    # Green
+        'Gamma': '#f44336'     # Red
+    }
+    
+    # Pens are built once here rather than on every redraw
+    BAND_PENS = {band: pg.mkPen(color=color, width=2) for band, color in BAND_COLORS.items()}
+    POS_PEN = pg.mkPen(color='#00ff00', width=2, style=Qt.DashLine)
+    START_PEN = pg.mkPen(color='#00ff00', width=1, style=Qt.DotLine)
+    END_PEN = pg.mkPen(color='#ff0000', width=1, style=Qt.DotLine)
+    
     def __init__(self):
         super().__init__()
         self.analyzer = None
@@ -22,6 +59,31 @@ class PowerPlot(QWidget):
         self.duration = 0
         self.timeframe_start = 0
         self.timeframe_end = 0
+        self._timeframe_active = False  # True when a sub-range of the recording is analysed
+        self._sample_period = 0.0  # Seconds per sample; time steps below this are ignored
+        
+        # Band power already calculated: (channel, band, start, end) -> power
+        self._power_cache = BoundedCache(16)
+        
+        # Background calculation in flight, if any
+        self._power_worker = None
+        
+        # Set when an update was skipped because the widget was hidden
+        self._pending_update = False
+        
+        # x extent of the drawn power curve, None when nothing is drawn
+        self._x_bounds = None
+        
+        # Time axis of the last redraw: (start, end, n) and the vector itself
+        self._time_vector_key = None
+        self._time_vector = None
+        
+        # Setter bursts (linked channel/band widgets, timeframe drags)
+        # collapse into one redraw at most every 16 ms
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(16)
+        self._update_timer.timeout.connect(self.update_plot)
         
         self.init_ui()
         
@@ -40,185 +102,267 @@ class PowerPlot(QWidget):
         # Constrain plot view - no negative times, no scrolling beyond data
         self.plot_widget.getPlotItem().getViewBox().setLimits(xMin=0, yMin=0)
         
+        # Draw about one min/max pair per pixel column of the visible range
+        self.plot_widget.setDownsampling(auto=True, mode='peak')
+        self.plot_widget.setClipToView(True)
+        
+        # Persistent power curve and marker lines, updated in place on redraw;
+        # band power is always finite, so skip pyqtgraph's NaN scan
+        self._power_curve = pg.PlotDataItem(pen=self.BAND_PENS['Alpha'], skipFiniteCheck=True)
+        self.plot_widget.addItem(self._power_curve)
+        self._pos_line = pg.InfiniteLine(angle=90, pen=self.POS_PEN)
+        self._start_line = pg.InfiniteLine(angle=90, pen=self.START_PEN)
+        self._end_line = pg.InfiniteLine(angle=90, pen=self.END_PEN)
+        for line in (self._pos_line, self._start_line, self._end_line):
+            line.setVisible(False)
+            self.plot_widget.addItem(line)
+        
         layout.addWidget(self.plot_widget)
         
     def set_analyzer(self, analyzer):
         """Set the EEG analyzer"""
+        if analyzer is not None and not hasattr(analyzer, 'calculate_band_power'):
+            logger.error("Power plot needs an analyzer with calculate_band_power")
+            analyzer = None
         self.analyzer = analyzer
+        self._power_cache.clear()
+        # Drop the previous recording's curve so the next time step redraws
+        self.clear_plot()
         if analyzer and hasattr(analyzer, 'processor') and analyzer.processor:
             self.duration = analyzer.processor.get_duration()
             self.timeframe_end = self.duration
+            self._sample_period = 1.0 / analyzer.processor.get_sampling_rate()
             # Set maximum X limit to data duration
             self.plot_widget.getPlotItem().getViewBox().setLimits(xMax=self.duration)
-        self.update_plot()
+        self._update_timeframe_active()
+        self.schedule_update()
         
     def set_channel(self, channel_idx):
         """Set the channel to analyze"""
+        if channel_idx == self.current_channel:
+            return
         self.current_channel = channel_idx
-        self.update_plot()
+        self.schedule_update()
         
     def set_band(self, band_name):
         """Set the frequency band to analyze"""
+        if band_name == self.current_band:
+            return
         self.current_band = band_name
-        self.update_plot()
+        self.schedule_update()
         
     def set_time_window(self, current_time, total_duration):
         """Set the current time window"""
-        self.current_time = max(0, current_time)  # No negative times
+        current_time = max(0, current_time)  # No negative times
+        duration_changed = total_duration != self.duration
+        # Ignore steps smaller than one sample once the plot is drawn
+        if (not duration_changed and self._x_bounds is not None
+                and abs(current_time - self.current_time) < self._sample_period):
+            return
+        self.current_time = current_time
         self.duration = total_duration
         # Update X limits
         self.plot_widget.getPlotItem().getViewBox().setLimits(xMax=total_duration)
-        self.update_plot()
+        
+        # Power only depends on channel, band and timeframe; once drawn, a
+        # plain time step just moves the position indicator
+        if duration_changed or self._x_bounds is None:
+            self._update_timeframe_active()
+            self.schedule_update()
+        else:
+            self._update_time_line()
         
     def set_timeframe(self, start_time, end_time):
         """Set analysis timeframe"""
-        self.timeframe_start = max(0, start_time)  # No negative times
-        self.timeframe_end = min(end_time, self.duration) if self.duration > 0 else end_time
-        self.update_plot()
+        start_time = max(0, start_time)  # No negative times
+        end_time = min(end_time, self.duration) if self.duration > 0 else end_time
+        if (start_time, end_time) == (self.timeframe_start, self.timeframe_end):
+            return
+        self.timeframe_start = start_time
+        self.timeframe_end = end_time
+        self._update_timeframe_active()
+        self.schedule_update()
+        
+    def _update_timeframe_active(self):
+        """Recompute whether update_plot should restrict itself to the timeframe"""
+        self._timeframe_active = self.timeframe_start > 0 or self.timeframe_end < self.duration
         
+    def schedule_update(self):
+        """Redraw the plot once pending changes have settled"""
+        self._update_timer.start()
+        
+    def showEvent(self, event):
+        """Run the update skipped while the widget was hidden"""
+        super().showEvent(event)
+        if self._pending_update:
+            self.schedule_update()
+            
     def update_plot(self):
         """Update the power plot for any frequency band"""
+        self._update_timer.stop()
         if not self.analyzer:
             return
+        if not self.isVisible():
+            # Hidden tab or collapsed pane: catch up in showEvent instead
+            self._pending_update = True
+            return
+        self._pending_update = False
             
-        try:
-            # Clear existing plot
-            self.plot_widget.clear()
-            
-            # Use the enhanced calculate_band_power method for all bands
-            if hasattr(self.analyzer, 'calculate_band_power'):
-                # Use timeframe if set, otherwise full duration
-                start_time = self.timeframe_start if self.timeframe_start > 0 or self.timeframe_end < self.duration else None
-                end_time = self.timeframe_end if self.timeframe_start > 0 or self.timeframe_end < self.duration else None
-                
-                power_data = self.analyzer.calculate_band_power(
-                    self.current_band,
-                    channel_idx=self.current_channel,
-                    start_time=start_time,
-                    end_time=end_time
-                )
-                
-                if power_data is not None and len(power_data) > 0:
-                    # Create time vector
-                    if start_time is not None and end_time is not None:
-                        time_vector = np.linspace(start_time, end_time, len(power_data))
-                    else:
-                        time_vector = np.linspace(0, self.duration, len(power_data))
-                    
-                    # Define band colors
-                    band_colors = {
-                        'Alpha': '#ff9800',    # Orange
-                        'Beta': '#2196f3',     # Blue  
-                        'Theta': '#9c27b0',    # Purple
-                        'Delta': '#4caf50',    # Green
-                        'Gamma': '#f44336'     # Red
-                    }
-                    
-                    color = band_colors.get(self.current_band, '#ff9800')
-                    pen = pg.mkPen(color=color, width=2)
-                    
-                    # Plot power data
-                    self.plot_widget.plot(time_vector, power_data, pen=pen)
-                    
-                    # Set X range (no negative times, bounded by data)
-                    x_min = max(0, np.min(time_vector))
-                    x_max = min(self.duration, np.max(time_vector)) if self.duration > 0 else np.max(time_vector)
-                    self.plot_widget.setXRange(x_min, x_max, padding=0)
-                    
-                    # Set Y range (no negative values)
-                    y_max = np.max(power_data) if len(power_data) > 0 and np.max(power_data) > 0 else 1
-                    self.plot_widget.setYRange(0, y_max * 1.5, padding=0)
-                    
-                    # Add current position indicator
-                    if self.current_time >= x_min and self.current_time <= x_max:
-                        pos_line = pg.InfiniteLine(pos=self.current_time, angle=90, 
-                                                 pen=pg.mkPen(color='#00ff00', width=2, style=2))
-                        self.plot_widget.addItem(pos_line)
-                        
-                    # Add timeframe boundary lines if using custom timeframe
-                    if start_time is not None and end_time is not None:
-                        start_line = pg.InfiniteLine(pos=start_time, angle=90, 
-                                                   pen=pg.mkPen(color='#00ff00', width=1, style=3))
-                        end_line = pg.InfiniteLine(pos=end_time, angle=90, 
-                                                 pen=pg.mkPen(color='#ff0000', width=1, style=3))
-                        self.plot_widget.addItem(start_line)
-                        self.plot_widget.addItem(end_line)
-                        
-            else:
-                # Fallback for older analyzer
-                if self.current_band == 'Alpha':
-                    time_vector, power_data = self.analyzer.calculate_alpha_power_sliding(
-                        channel_idx=self.current_channel,
-                        window_length=2.0,
-                        overlap=0.5
-                    )
-                    
-                    if time_vector is not None and power_data is not None and len(power_data) > 0:
-                        pen = pg.mkPen(color='#ff9800', width=2)
-                        self.plot_widget.plot(time_vector, power_data, pen=pen)
-                        
-                        # Constrain ranges
-                        x_min = max(0, np.min(time_vector))
-                        x_max = min(self.duration, np.max(time_vector)) if self.duration > 0 else np.max(time_vector)
-                        self.plot_widget.setXRange(x_min, x_max, padding=0)
-                        
-                        y_max = np.max(power_data) if np.max(power_data) > 0 else 1
-                        self.plot_widget.setYRange(0, y_max * 1.5, padding=0)
-                
-        except Exception as e:
-            print(f"Error updating power plot: {e}")
-            import traceback
-            traceback.print_exc()
-            
-    def update_power_data(self, power_data, start_time, end_time):
-        """Update plot with specific power data and timeframe"""
-        if power_data is None or len(power_data) == 0:
+        # Calculate in the background unless cached; the current plot
+        # stays up until _on_power_finished redraws
+        key = self._power_key()
+        _, _, start_time, end_time = key
+        power_data = self._power_cache.get(key)
+        if power_data is None:
+            self._start_power_worker(key)
             return
             
+        # Suspend repaints so the data, range and marker changes land in one paint
+        self.plot_widget.setUpdatesEnabled(False)
         try:
-            # Clear existing plot
-            self.plot_widget.clear()
+            # Hide the markers; they are shown again below where they apply
+            self._hide_markers()
             
-            # Ensure no negative times
-            start_time = max(0, start_time)
-            end_time = max(start_time + 0.1, end_time)
+            if len(power_data) == 0:
+                self._power_curve.setData([], [])
+                return
             
-            # Create time vector for the timeframe
-            time_vector = np.linspace(start_time, end_time, len(power_data))
+            # Create time vector
+            if start_time is not None and end_time is not None:
+                time_vector = self._get_time_vector(start_time, end_time, len(power_data))
+            else:
+                time_vector = self._get_time_vector(0, self.duration, len(power_data))
             
-            # Band colors
-            band_colors = {
-                'Alpha': '#ff9800',    # Orange
-                'Beta': '#2196f3',     # Blue  
-                'Theta': '#9c27b0',    # Purple
-                'Delta': '#4caf50',    # Green
-                'Gamma': '#f44336'     # Red
-            }
+            # Plot power data
+            self._power_curve.setPen(self._band_pen())
+            self._power_curve.setData(time_vector, power_data)
             
-            color = band_colors.get(self.current_band, '#ff9800')
-            pen = pg.mkPen(color=color, width=2)
+            # Set X range (no negative times, bounded by data); the
+            # time vector is ascending, so its ends are its extremes
+            x_min = max(0, time_vector[0])
+            x_max = min(self.duration, time_vector[-1]) if self.duration > 0 else time_vector[-1]
             
-            # Plot power data
-            self.plot_widget.plot(time_vector, power_data, pen=pen)
+            # Set Y range (no negative values); both axes in one call so
+            # the view emits a single range change
+            y_max = _y_max(power_data)
+            self.plot_widget.setRange(xRange=(x_min, x_max), yRange=(0, y_max * 1.5), padding=0)
             
-            # Set X range (no negative times, bounded by data)
-            self.plot_widget.setXRange(start_time, min(end_time, self.duration) if self.duration > 0 else end_time, padding=0)
+            # Add current position indicator
+            self._x_bounds = (x_min, x_max)
+            self._update_time_line()
             
-            # Set Y range (no negative values)
-            y_max = np.max(power_data) if np.max(power_data) > 0 else 1
-            self.plot_widget.setYRange(0, y_max * 1.5, padding=0)
-                
-            # Add timeframe boundary lines
-            start_line = pg.InfiniteLine(pos=start_time, angle=90, 
-                                       pen=pg.mkPen(color='#00ff00', width=1, style=3))
-            end_line = pg.InfiniteLine(pos=end_time, angle=90, 
-                                     pen=pg.mkPen(color='#ff0000', width=1, style=3))
-            self.plot_widget.addItem(start_line)
-            self.plot_widget.addItem(end_line)
+            # Show timeframe boundary lines if using custom timeframe
+            if start_time is not None and end_time is not None:
+                self._show_timeframe_lines(start_time, end_time)
+        finally:
+            self.plot_widget.setUpdatesEnabled(True)
+            self.plot_widget.viewport().update()
+
+    def _power_key(self):
+        """(channel, band, start, end) of the power to plot; no timeframe means the full duration"""
+        if self._timeframe_active:
+            return (self.current_channel, self.current_band, self.timeframe_start, self.timeframe_end)
+        return (self.current_channel, self.current_band, None, None)
+        
+    def _start_power_worker(self, key):
+        """Calculate band power for key on the global thread pool"""
+        if self._power_worker is not None:
+            # Turned away; _on_power_finished starts the current key once the
+            # calculation in flight finishes, whether it succeeded or not
+            return
+        self._power_worker = FunctionWorker(_calculate_band_power, self.analyzer, key)
+        self._power_worker.start(self._on_power_finished)
+        
+    def _on_power_finished(self, power_data):
+        """Cache a calculated band power and redraw"""
+        worker, self._power_worker = self._power_worker, None
+        analyzer, key = worker.args
+        if analyzer is not self.analyzer:
+            # Stale result from a previous recording; the calculation for the
+            # current one was turned away while this was in flight, so start it now
+            self.update_plot()
+            return
+        if power_data is None:
+            # Not cached, so a transient failure is retried on the next update;
+            # the previous curve stays up meanwhile
+            logger.warning("No %s band power for channel %d", key[1], key[0])
+            # A newer request may have been turned away while this ran
+            if key != self._power_key():
+                self.update_plot()
+            return
+        # float32 is plenty for display and halves what the curve walks
+        power_data = np.ascontiguousarray(power_data, dtype=np.float32)
+        power_data.setflags(write=False)  # shared by later redraws
+        self._power_cache.put(key, power_data)
+        self.update_plot()
+        
+    def _get_time_vector(self, start_time, end_time, n):
+        """n evenly spaced times from start_time to end_time, reused while unchanged"""
+        key = (start_time, end_time, n)
+        if key != self._time_vector_key:
+            step = (end_time - start_time) / (n - 1) if n > 1 else 0.0
+            time_vector = (start_time + np.arange(n) * step).astype(np.float32)
+            if n > 1:
+                time_vector[-1] = end_time
+            self._time_vector = time_vector
+            self._time_vector_key = key
+        return self._time_vector
+        
+    def _band_pen(self):
+        """Pen for the current band, orange for unknown bands"""
+        return self.BAND_PENS.get(self.current_band, self.BAND_PENS['Alpha'])
+        
+    def _update_time_line(self):
+        """Show the current position indicator if it lies on the power curve"""
+        if self._x_bounds is None:
+            return
+        x_min, x_max = self._x_bounds
+        self._pos_line.setPos(self.current_time)
+        self._pos_line.setVisible(bool(x_min <= self.current_time <= x_max))
+        
+    def _show_timeframe_lines(self, start_time, end_time):
+        """Show the timeframe boundary lines"""
+        self._start_line.setPos(start_time)
+        self._end_line.setPos(end_time)
+        self._start_line.setVisible(True)
+        self._end_line.setVisible(True)
+        
+    def _hide_markers(self):
+        """Hide the position and timeframe lines"""
+        for line in (self._pos_line, self._start_line, self._end_line):
+            line.setVisible(False)
+        self._x_bounds = None
+        
+    def update_power_data(self, power_data, start_time, end_time):
+        """Update plot with specific power data and timeframe"""
+        if power_data is None or len(power_data) == 0:
+            return
+            
+        # Hide the markers of the previous plot
+        self._hide_markers()
+        
+        # Ensure no negative times
+        start_time = max(0, start_time)
+        end_time = max(start_time + 0.1, end_time)
+        
+        # Create time vector for the timeframe
+        time_vector = self._get_time_vector(start_time, end_time, len(power_data))
+        
+        # Plot power data
+        self._power_curve.setPen(self._band_pen())
+        self._power_curve.setData(time_vector, power_data)
+        
+        # Set X range (no negative times, bounded by data)
+        self.plot_widget.setXRange(start_time, min(end_time, self.duration) if self.duration > 0 else end_time, padding=0)
+        
+        # Set Y range (no negative values)
+        y_max = _y_max(power_data)
+        self.plot_widget.setYRange(0, y_max * 1.5, padding=0)
             
-        except Exception as e:
-            print(f"Error updating power data: {e}")
+        # Show timeframe boundary lines
+        self._show_timeframe_lines(start_time, end_time)
             
     def clear_plot(self):
         """Clear the plot"""
-        self.plot_widget.clear()
+        self._power_curve.setData([], [])
+        self._hide_markers()
@@ -20,8 +20,13 @@ def main():
     
     try:
         from PyQt5.QtWidgets import QApplication
+        import pyqtgraph as pg
+        from utils._njit import HAVE_NUMBA
         from gui.main_window import main as gui_main
         
+        # App-wide pyqtgraph settings: let it use numba for its array work when installed
+        pg.setConfigOptions(useNumba=HAVE_NUMBA)
+        
         # Start the GUI application
         gui_main()
         
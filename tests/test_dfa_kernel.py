@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for the DFA kernels
+Checks the Numba kernel against the NumPy path and the α of signals with a known exponent
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root
+
+import numpy as np
+from gui.analysis.dfa_analysis import (_fluctuations, _scale_fluctuation, _segment_indices,
+                                       calculate_dfa_batch)
+from utils._njit import HAVE_NUMBA
+
+# Log-spaced scales as calculate_dfa_direct builds them for 4 - 1000 samples
+SCALES = np.unique(np.round(np.logspace(np.log10(4), np.log10(1000), 20)).astype(np.int64))
+
+
+def _centered(signal):
+    """Mean-removed float32 signal, as calculate_dfa_direct hands it to the kernels"""
+    return np.subtract(signal, np.mean(signal, dtype=np.float64), dtype=np.float32)
+
+
+def _alpha(fluctuations):
+    """Slope of log F(scale) against log scale"""
+    return np.polyfit(np.log10(SCALES), np.log10(fluctuations), 1)[0]
+
+
+def _signals():
+    """White noise (α ≈ 0.5) and Brownian motion (α ≈ 1.5)"""
+    rng = np.random.default_rng(42)
+    white = rng.standard_normal(20000)
+    return {"white": (white, 0.5), "brownian": (np.cumsum(rng.standard_normal(20000)), 1.5)}
+
+
+def test_kernel_matches_numpy():
+    """The Numba kernel gives the same F(scale) as _scale_fluctuation"""
+    print(f"🔬 Kernel: {'Numba' if HAVE_NUMBA else 'NumPy fallback'}")
+    for name, (signal, _) in _signals().items():
+        centered = _centered(signal)
+        profile = np.cumsum(centered, dtype=np.float64)
+        for max_segments in (1, 10, 500):
+            kernel = _fluctuations(centered, SCALES, max_segments)
+            reference = np.array([_scale_fluctuation(profile, scale, max_segments) for scale in SCALES])
+            assert np.allclose(kernel, reference, rtol=1e-6), (name, max_segments)
+        print(f"✅ {name}: kernel matches NumPy path")
+
+
+def test_batch_matches_kernel():
+    """calculate_dfa_batch gives the same α as the single-channel kernel"""
+    signals = [signal for signal, _ in _signals().values()]
+    profiles = np.array([np.cumsum(_centered(signal), dtype=np.float64) for signal in signals])
+    batch = calculate_dfa_batch(profiles, SCALES, max_segments=500)
+    single = [_alpha(_fluctuations(_centered(signal), SCALES, 500)) for signal in signals]
+    assert np.allclose(batch, single, rtol=1e-6), (batch, single)
+    print(f"✅ Batch α {np.round(batch, 4)} matches single-channel α")
+
+
+def test_expected_alpha():
+    """White noise gives α ≈ 0.5 and Brownian motion α ≈ 1.5"""
+    for name, (signal, expected) in _signals().items():
+        alpha = _alpha(_fluctuations(_centered(signal), SCALES, 500))
+        print(f"📊 {name}: α = {alpha:.4f} (expected ≈ {expected})")
+        assert abs(alpha - expected) < 0.1, (name, alpha)
+
+
+def test_segment_indices():
+    """Segment selection is evenly spaced and never empty, even for max_segments < 2"""
+    assert list(_segment_indices(10, 3)) == [0, 4, 9]
+    assert list(_segment_indices(5, 500)) == [0, 1, 2, 3, 4]
+    assert list(_segment_indices(10, 1)) == [0]
+    assert list(_segment_indices(10, 0)) == [0]
+    print("✅ Segment indices OK")
+
+
+if __name__ == "__main__":
+    test_kernel_matches_numpy()
+    test_batch_matches_kernel()
+    test_expected_alpha()
+    test_segment_indices()
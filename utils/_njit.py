@@ -0,0 +1,17 @@
+"""
+Numba JIT Helpers
+Optional numba import with a pass-through fallback so kernels can be declared unconditionally
+"""
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that returns the function unchanged"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
@@ -0,0 +1,18 @@
+"""
+Bounded Cache
+Small size-limited dict for results that are expensive to recompute
+"""
+
+
+class BoundedCache(dict):
+    """dict holding at most maxsize entries; put() evicts the oldest entry first"""
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def put(self, key, value):
+        """Store value under key, evicting the oldest entry when full"""
+        if key not in self and len(self) >= self.maxsize:
+            self.pop(next(iter(self)))
+        self[key] = value
@@ -0,0 +1,94 @@
+"""
+Style Sheets
+Shared Qt style sheets, parsed once per widget tree instead of once per control
+"""
+
+# Channel trace colours, shared by plot pens and channel checkboxes
+CHANNEL_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+                  "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+
+# Checkbox colour per palette entry, picked by the checkbox's "ch" property
+CHANNEL_CHECKBOX_QSS = "".join(f"""
+    QCheckBox[ch="{i}"] {{
+        color: {color};
+    }}
+    QCheckBox[ch="{i}"]::indicator:checked {{
+        background-color: {color};
+        border: 1px solid {color};
+    }}""" for i, color in enumerate(CHANNEL_COLORS))
+
+# Dark theme for the EEG timeline tab and its control panel
+TIMELINE_QSS = """
+    QGroupBox {
+        font-weight: bold;
+        color: #ffffff;
+        border: 1px solid #555555;
+        border-radius: 5px;
+        margin-top: 10px;
+        padding-top: 10px;
+        background-color: #3c3c3c;
+    }
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        left: 10px;
+        padding: 0 5px 0 5px;
+    }
+    QPushButton {
+        background-color: #4a4a4a;
+        border: 1px solid #666666;
+        color: #ffffff;
+        padding: 4px 8px;
+        border-radius: 3px;
+        font-size: 11px;
+    }
+    QPushButton:hover {
+        background-color: #555555;
+    }
+    QPushButton:pressed {
+        background-color: #333333;
+    }
+    QPushButton#toggleControls {
+        padding: 0px;
+        font-size: 10px;
+    }
+    QSpinBox, QDoubleSpinBox {
+        background-color: #3c3c3c;
+        border: 1px solid #555555;
+        color: #ffffff;
+        padding: 2px;
+        border-radius: 3px;
+        min-width: 60px;
+    }
+    QScrollArea {
+        border: none;
+        background-color: transparent;
+    }
+    QScrollBar:vertical {
+        border: none;
+        background: #2b2b2b;
+        width: 10px;
+        margin: 0px;
+    }
+    QScrollBar::handle:vertical {
+        background: #555555;
+        min-height: 20px;
+        border-radius: 5px;
+    }
+    QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
+        height: 0px;
+    }
+    QCheckBox {
+        font-weight: bold;
+        spacing: 5px;
+        background-color: #3c3c3c;
+        padding: 2px;
+    }
+    QCheckBox::indicator {
+        width: 13px;
+        height: 13px;
+    }
+    QCheckBox::indicator:unchecked {
+        background-color: #3c3c3c;
+        border: 1px solid #555555;
+    }
+""" + CHANNEL_CHECKBOX_QSS
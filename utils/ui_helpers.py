@@ -5,6 +5,7 @@ Common UI components and helper functions
 
 from PyQt5.QtWidgets import QStyle, QPushButton, QSlider, QLabel, QHBoxLayout, QVBoxLayout, QComboBox
 from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QOpenGLContext
 import pyqtgraph as pg
 
 
@@ -123,6 +124,15 @@ def setup_dark_plot(plot_widget: pg.PlotWidget, x_label: str, y_label: str):
     return plot_widget
 
 
+def enable_opengl(plot_widget: pg.PlotWidget) -> bool:
+    """Draw a plot widget through an OpenGL viewport if a GL context can be created"""
+    context = QOpenGLContext()
+    if not context.create():
+        return False
+    plot_widget.useOpenGL(True)
+    return True
+
+
 def create_collapsible_button(text_expanded: str, text_collapsed: str) -> QPushButton:
     """Create a button for collapsing/expanding panels"""
     button = QPushButton(text_expanded)
@@ -0,0 +1,43 @@
+"""
+Background Workers
+Run a function on the global thread pool and hand its result back to the GUI thread
+"""
+
+import logging
+from PyQt5.QtCore import pyqtSignal, QObject, QRunnable, QThreadPool
+
+logger = logging.getLogger(__name__)
+
+
+class _WorkerSignals(QObject):
+    """Signals for FunctionWorker (QRunnable itself cannot emit)"""
+    finished = pyqtSignal(object)  # return value, None if the function raised
+
+
+class FunctionWorker(QRunnable):
+    """Calls fn(*args) on a pool thread and emits signals.finished with the result
+
+    ``fn`` and ``args`` stay on the worker, so a finished handler can tell
+    which request the result belongs to. ``finished`` is emitted exactly once,
+    with None if ``fn`` raised (the error is logged here).
+    """
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = _WorkerSignals()
+
+    def run(self):
+        result = None
+        try:
+            result = self.fn(*self.args)
+        except Exception:
+            logger.exception("Background call to %s failed", getattr(self.fn, "__qualname__", self.fn))
+        finally:
+            self.signals.finished.emit(result)
+
+    def start(self, on_finished):
+        """Connect on_finished to the result and queue the worker on the global thread pool"""
+        self.signals.finished.connect(on_finished)
+        QThreadPool.globalInstance().start(self)